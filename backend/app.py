@@ -1,18 +1,41 @@
 from __future__ import annotations
 
+import atexit
+import json
+import logging
 import os
+import queue
+import re
 import sqlite3
 import secrets
+import threading
 import time
-from datetime import datetime, timedelta
+from pathlib import Path
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
 from functools import wraps
-from urllib.parse import urlparse
+from typing import Iterator
 
-from flask import Flask, jsonify, redirect, render_template, request, g, current_app
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unsynchronised initialisation
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib encoder is used when orjson is absent
+    orjson = None
+
+from flask import Flask, Response, redirect, render_template, request, g, current_app
 
 BASE62_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE62_BYTES = BASE62_ALPHABET.encode("ascii")
 CODE_LENGTH = 7
+CODE_SPACE = 62 ** CODE_LENGTH
 MAX_URL_LENGTH = 2048
+CUSTOM_CODE_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+# Authority part of a URL: everything up to the first "/", "?" or "#", with no whitespace.
+URL_NETLOC_PATTERN = re.compile(r"[^/?#\s]+(?=[/?#]|\Z)")
 EXPIRATION_HOURS = 24  # URLs expire after 24 hours
 RATE_LIMITS = {
     "shorten": {"limit": 10, "window": 60},
@@ -20,6 +43,119 @@ RATE_LIMITS = {
 }
 SPAM_WINDOW_SECONDS = 30
 SPAM_MAX_DUPLICATES = 3
+EXPIRED_SWEEP_SECONDS = 300  # How often expired URLs and spam windows are purged in the background
+URL_CACHE_SIZE = 100_000
+URL_CACHE_TTL_SECONDS = 60
+RATE_STATE_MAX_ENTRIES = 100_000  # Oldest rate-limit windows are evicted past this size
+CLICK_FLUSH_SECONDS = 1  # Buffered click counts are written back at this interval
+# journal_mode=WAL is persisted in the database file; the rest are per-connection.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL;"
+    "PRAGMA temp_store=MEMORY;"
+    "PRAGMA mmap_size=268435456;"
+    "PRAGMA cache_size=-20000;"
+    "PRAGMA busy_timeout=5000;"
+)
+STATEMENT_CACHE_SIZE = 256
+SCHEMA_VERSION = 1  # Bump whenever schema.sql changes so existing databases re-run it
+POOL_SIZE = 8  # Idle connections kept per database and access mode
+READ_ONLY_MMAP_SIZE = 1073741824  # Redirect lookups read pages straight from the mapping
+READ_ONLY_CONNECTION_PRAGMAS = (
+    "PRAGMA cache_size=-20000;"
+    "PRAGMA busy_timeout=5000;"
+    f"PRAGMA mmap_size={READ_ONLY_MMAP_SIZE};"
+)
+
+# SQL is kept in module constants so each connection's statement cache reuses the prepared form.
+SQL_SELECT_LIVE_URL = "SELECT original_url, expires_at FROM urls WHERE code = ? AND expires_at > ?"
+# Returns no row when either the code or the original_url is already taken.
+SQL_INSERT_URL = (
+    "INSERT INTO urls (code, original_url, created_at, expires_at) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT DO NOTHING RETURNING code"
+)
+SQL_SELECT_CODE_BY_ORIGINAL = "SELECT code FROM urls WHERE original_url = ?"
+SQL_ADD_CLICKS = "UPDATE urls SET click_count = click_count + ? WHERE code = ?"
+SQL_DELETE_EXPIRED_URLS = "DELETE FROM urls WHERE expires_at <= ?"
+SQL_SELECT_SPAM = "SELECT window_start, count FROM spam_submissions WHERE ip = ? AND original_url = ?"
+SQL_RESET_SPAM = (
+    "INSERT INTO spam_submissions (ip, original_url, window_start, count) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(ip, original_url) DO UPDATE SET window_start = excluded.window_start, count = excluded.count"
+)
+SQL_UPDATE_SPAM = "UPDATE spam_submissions SET count = ? WHERE ip = ? AND original_url = ?"
+SQL_DELETE_STALE_SPAM = "DELETE FROM spam_submissions WHERE window_start <= ?"
+SQL_LEGACY_TIMESTAMP_TYPE = "SELECT type FROM pragma_table_info('urls') WHERE name = 'expires_at'"
+# One-time upgrade of urls.created_at/expires_at from ISO-8601 text to unix seconds.
+# The current schema is spliced in between so the new table matches schema.sql.
+SQL_MIGRATE_TIMESTAMPS_BEGIN = """
+BEGIN;
+DROP INDEX IF EXISTS idx_urls_expires_at;
+ALTER TABLE urls RENAME TO urls_legacy;
+"""
+SQL_MIGRATE_TIMESTAMPS_END = """
+INSERT INTO urls (id, code, original_url, created_at, expires_at, click_count)
+SELECT id, code, original_url,
+       CAST(strftime('%s', created_at) AS INTEGER),
+       CAST(strftime('%s', expires_at) AS INTEGER),
+       click_count
+FROM urls_legacy;
+DROP TABLE urls_legacy;
+COMMIT;
+"""
+
+_wal_databases: set[str] = set()
+# (database, readonly) -> idle connections
+_pools: dict[tuple[str, bool], queue.LifoQueue] = {}
+_pool_lock = threading.Lock()
+# Pooled connections inherited across fork(); kept referenced so the child never closes them.
+_inherited_connections: list[queue.LifoQueue] = []
+_swept_databases: set[str] = set()
+_background_lock = threading.Lock()
+_click_flusher: threading.Thread | None = None
+# (database, code) -> clicks not yet written to the urls table
+_click_buffer: Counter = Counter()
+_click_lock = threading.Lock()
+# (ip, bucket) -> (window_start, count), ordered oldest window first
+_rate_state: OrderedDict[tuple[str, str], tuple[int, int]] = OrderedDict()
+_rate_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries also expire `ttl` seconds after insertion."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, stored_at = item
+            if time.monotonic() - stored_at >= self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+# (database, code) -> (original_url, expires_at)
+_url_cache = TTLCache(URL_CACHE_SIZE, URL_CACHE_TTL_SECONDS)
 
 
 def create_app(test_config: dict | None = None) -> Flask:
@@ -31,7 +167,6 @@ def create_app(test_config: dict | None = None) -> Flask:
     app.config.from_mapping(
         DATABASE=os.path.join(os.path.dirname(__file__), "..", "instance", "urlshortener.sqlite3"),
         BASE_URL=os.environ.get("BASE_URL", ""),
-        JSONIFY_PRETTYPRINT_REGULAR=False,
     )
 
     if test_config:
@@ -41,10 +176,12 @@ def create_app(test_config: dict | None = None) -> Flask:
 
     with app.app_context():
         init_db()
+    start_expiry_sweeper(app.config["DATABASE"])
+    start_click_flusher()
 
     @app.route("/")
     def index() -> str:
-        return render_template("index.html")
+        return render_static("index.html")
 
     @app.post("/shorten")
     @rate_limit("shorten")
@@ -55,119 +192,310 @@ def create_app(test_config: dict | None = None) -> Flask:
         
         error = validate_url(original_url)
         if error:
-            return jsonify({"error": error}), 400
+            return json_response({"error": error}, 400)
 
         # Validate custom code if provided
         if custom_code:
             code_error = validate_custom_code(custom_code)
             if code_error:
-                return jsonify({"error": code_error}), 400
+                return json_response({"error": code_error}, 400)
 
         db = get_db()
-        if is_spam_submission(db, get_client_ip(), original_url):
-            return jsonify({"error": "Too many repeated submissions. Try again later."}), 429
-
-        existing = db.execute(
-            "SELECT code, original_url FROM urls WHERE original_url = ?",
-            (original_url,),
-        ).fetchone()
-        if existing:
-            return (
-                jsonify(
+        # Spam bookkeeping and the insert-or-fetch share one transaction and one commit.
+        with transaction(db):
+            if is_spam_submission(db, get_client_ip(), original_url):
+                return json_response(ERROR_REPEATED_SUBMISSION, 429)
+
+            created_at = int(time.time())
+            expires_at = created_at + EXPIRATION_HOURS * 3600
+
+            # If custom code is provided, try to use it
+            if custom_code:
+                result = insert_custom_url(db, custom_code, original_url, created_at, expires_at)
+                if result is None:
+                    return json_response(ERROR_CODE_TAKEN, 409)
+            else:
+                result = insert_unique_url(db, original_url, created_at, expires_at)
+                if result is None:
+                    return json_response(ERROR_NO_UNIQUE_CODE, 409)
+
+            code, created = result
+            if not created:
+                return json_response(
                     {
-                        "code": existing["code"],
-                        "original_url": existing["original_url"],
-                        "short_url": build_short_url(existing["code"]),
+                        "code": code,
+                        "original_url": original_url,
+                        "short_url": build_short_url(code),
                         "message": "This URL was already shortened.",
-                    }
-                ),
-                200,
-            )
+                    },
+                    200,
+                )
 
-        created_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
-        expires_at = (datetime.utcnow() + timedelta(hours=EXPIRATION_HOURS)).isoformat(timespec="seconds") + "Z"
-        
-        # If custom code is provided, try to use it
-        if custom_code:
-            code = insert_custom_url(db, custom_code, original_url, created_at, expires_at)
-            if code is None:
-                return jsonify({"error": "This short code is already taken. Please choose another one."}), 409
-        else:
-            code = insert_unique_url(db, original_url, created_at, expires_at)
-            if not code:
-                return jsonify({"error": "Unable to generate a unique short code."}), 409
-
-        return (
-            jsonify(
+            return json_response(
                 {
                     "code": code,
                     "original_url": original_url,
                     "short_url": build_short_url(code),
-                    "expires_at": expires_at,
-                }
-            ),
-            201,
-        )
+                    "expires_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(expires_at)),
+                },
+                201,
+            )
 
     @app.get("/<code>")
     @rate_limit("follow")
     def follow(code: str):
         if not code or len(code) > 32:
-            return render_template("not_found.html", code=code), 404
-
-        db = get_db()
-        row = db.execute(
-            "SELECT id, original_url, expires_at FROM urls WHERE code = ?",
-            (code,),
-        ).fetchone()
+            return render_static("not_found.html"), 404
+
+        database = app_database_path()
+        now = int(time.time())
+        cache_key = (database, code)
+        cached = _url_cache.get(cache_key)
+        if cached is not None and cached[1] > now:
+            record_click(database, code)
+            return redirect(cached[0], code=302)
+
+        # Expired rows never match; the background sweeper deletes them later.
+        row = get_read_db().execute(SQL_SELECT_LIVE_URL, (code, now)).fetchone()
         if not row:
-            return render_template("not_found.html", code=code), 404
-
-        # Check if URL has expired
-        expires_at = datetime.fromisoformat(row["expires_at"].replace("Z", "+00:00"))
-        if datetime.utcnow().replace(tzinfo=None) > expires_at.replace(tzinfo=None):
-            # URL has expired, delete it
-            db.execute("DELETE FROM urls WHERE id = ?", (row["id"],))
-            db.commit()
-            return render_template("not_found.html", code=code), 404
-
-        db.execute(
-            "UPDATE urls SET click_count = click_count + 1 WHERE id = ?",
-            (row["id"],),
-        )
-        db.commit()
+            _url_cache.pop(cache_key)
+            return render_static("not_found.html"), 404
+
+        record_click(database, code)
+        _url_cache.set(cache_key, (row["original_url"], row["expires_at"]))
         return redirect(row["original_url"], code=302)
 
     @app.errorhandler(404)
     def not_found(_error):
-        return render_template("not_found.html", code=""), 404
+        return render_static("not_found.html"), 404
 
     @app.teardown_appcontext
     def close_db(_exception):
         db = g.pop("db", None)
         if db is not None:
-            db.close()
+            release_db(app_database_path(), db)
+        read_db = g.pop("read_db", None)
+        if read_db is not None:
+            release_db(app_database_path(), read_db, readonly=True)
 
     return app
 
 
 def get_db() -> sqlite3.Connection:
     if "db" not in g:
-        g.db = sqlite3.connect(app_database_path(), detect_types=sqlite3.PARSE_DECLTYPES)
-        g.db.row_factory = sqlite3.Row
+        g.db = acquire_db(app_database_path())
     return g.db
 
 
+def get_read_db() -> sqlite3.Connection:
+    """Read-only connection for queries that never write, such as redirect lookups."""
+    if "read_db" not in g:
+        g.read_db = acquire_db(app_database_path(), readonly=True)
+    return g.read_db
+
+
+def acquire_db(database: str, readonly: bool = False) -> sqlite3.Connection:
+    """Lease a pooled connection, opening a new one when the pool is empty."""
+    try:
+        return get_pool(database, readonly).get_nowait()
+    except queue.Empty:
+        return connect_db(database, readonly)
+
+
+def release_db(database: str, db: sqlite3.Connection, readonly: bool = False) -> None:
+    if db.in_transaction:
+        db.rollback()
+    try:
+        get_pool(database, readonly).put_nowait(db)
+    except queue.Full:
+        db.close()
+
+
+def get_pool(database: str, readonly: bool = False) -> queue.LifoQueue:
+    key = (database, readonly)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.setdefault(key, queue.LifoQueue(maxsize=POOL_SIZE))
+    return pool
+
+
+def connect_db(database: str, readonly: bool = False) -> sqlite3.Connection:
+    # Autocommit mode: multi-statement writes go through `transaction()`.
+    db = sqlite3.connect(
+        Path(database).resolve().as_uri() + "?mode=ro" if readonly else database,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        isolation_level=None,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+        uri=readonly,
+    )
+    db.row_factory = sqlite3.Row
+    if readonly:
+        db.executescript(READ_ONLY_CONNECTION_PRAGMAS)
+        return db
+    if database not in _wal_databases:
+        db.execute("PRAGMA journal_mode=WAL")
+        _wal_databases.add(database)
+    db.executescript(CONNECTION_PRAGMAS)
+    return db
+
+
+@contextmanager
+def transaction(db: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Run the enclosed statements in one write transaction."""
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        yield db
+    except BaseException:
+        # SQLite may already have rolled back (e.g. SQLITE_FULL); keep the original error.
+        if db.in_transaction:
+            db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+
 def app_database_path() -> str:
     return current_app.config["DATABASE"]
 
 
 def init_db() -> None:
-    db = sqlite3.connect(app_database_path())
-    schema_path = os.path.join(os.path.dirname(__file__), "schema.sql")
-    with open(schema_path, "r", encoding="utf-8") as file:
-        db.executescript(file.read())
-    db.close()
+    database = app_database_path()
+    with schema_lock(database):
+        db = sqlite3.connect(database)
+        try:
+            # Warm databases are skipped without reading or running schema.sql.
+            if db.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                return
+            schema_path = os.path.join(os.path.dirname(__file__), "schema.sql")
+            with open(schema_path, "r", encoding="utf-8") as file:
+                schema = file.read()
+            legacy = db.execute(SQL_LEGACY_TIMESTAMP_TYPE).fetchone()
+            if legacy and legacy[0].upper() == "TEXT":
+                db.executescript(SQL_MIGRATE_TIMESTAMPS_BEGIN + schema + SQL_MIGRATE_TIMESTAMPS_END)
+            else:
+                db.executescript(schema)
+            # Refresh planner statistics (sqlite_stat1) for tables whose indexes changed.
+            db.execute("PRAGMA optimize")
+            db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        finally:
+            db.close()
+
+
+@contextmanager
+def schema_lock(database: str) -> Iterator[None]:
+    """Serialise schema setup across worker processes sharing `database`."""
+    if fcntl is None:
+        yield
+        return
+    with open(database + ".lock", "w", encoding="utf-8") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def start_expiry_sweeper(database: str) -> None:
+    with _background_lock:
+        if database in _swept_databases:
+            return
+        _swept_databases.add(database)
+    start_background_task("expiry-sweeper", EXPIRED_SWEEP_SECONDS, delete_expired_rows, database)
+
+
+def start_background_task(name: str, interval: float, func, *args) -> threading.Thread:
+    """Call `func(*args)` every `interval` seconds on a daemon thread."""
+
+    def run() -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                func(*args)
+            except sqlite3.Error:
+                logger.exception("Background task %s failed", name)
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+def start_click_flusher() -> None:
+    global _click_flusher
+    with _background_lock:
+        if _click_flusher is not None:
+            return
+        _click_flusher = start_background_task("click-flusher", CLICK_FLUSH_SECONDS, flush_clicks)
+    atexit.register(flush_clicks)
+
+
+def record_click(database: str, code: str) -> None:
+    with _click_lock:
+        _click_buffer[(database, code)] += 1
+
+
+def flush_clicks() -> None:
+    """Write buffered click counts back with one transaction per database."""
+    with _click_lock:
+        if not _click_buffer:
+            return
+        pending = _click_buffer.copy()
+        _click_buffer.clear()
+
+    updates: dict[str, list[tuple[int, str]]] = {}
+    for (database, code), clicks in pending.items():
+        updates.setdefault(database, []).append((clicks, code))
+
+    for database, rows in updates.items():
+        try:
+            db = acquire_db(database)
+            try:
+                with transaction(db):
+                    db.executemany(SQL_ADD_CLICKS, rows)
+            finally:
+                release_db(database, db)
+        except sqlite3.Error:
+            logger.exception("Failed to flush click counts for %s", database)
+            # Keep the counts so the next flush retries them.
+            with _click_lock:
+                for clicks, code in rows:
+                    _click_buffer[(database, code)] += clicks
+
+
+def delete_expired_rows(database: str) -> None:
+    db = acquire_db(database)
+    try:
+        now = int(time.time())
+        db.execute(SQL_DELETE_EXPIRED_URLS, (now,))
+        db.execute(SQL_DELETE_STALE_SPAM, (now - SPAM_WINDOW_SECONDS,))
+    finally:
+        release_db(database, db)
+
+
+def _after_fork_in_child() -> None:
+    """Forked workers inherit module state but not threads; rebuild what the child needs."""
+    global _background_lock, _click_lock, _click_flusher, _pool_lock
+    # SQLite connections must not be used across fork(); the child opens its own.
+    _inherited_connections.extend(_pools.values())
+    _pools.clear()
+    _wal_databases.clear()
+    # Locks may have been held by a parent thread at fork time.
+    _pool_lock = threading.Lock()
+    _background_lock = threading.Lock()
+    _click_lock = threading.Lock()
+    # The parent still owns the clicks it buffered and flushes them itself.
+    _click_buffer.clear()
+    if _click_flusher is not None:
+        # atexit handlers survive fork, so only the thread needs restarting.
+        _click_flusher = start_background_task("click-flusher", CLICK_FLUSH_SECONDS, flush_clicks)
+    swept = list(_swept_databases)
+    _swept_databases.clear()
+    for database in swept:
+        start_expiry_sweeper(database)
+
+
+if hasattr(os, "register_at_fork"):  # POSIX only
+    os.register_at_fork(after_in_child=_after_fork_in_child)
 
 
 def validate_url(url: str) -> str | None:
@@ -176,10 +504,15 @@ def validate_url(url: str) -> str | None:
     if len(url) > MAX_URL_LENGTH:
         return "URL is too long."
 
-    parsed = urlparse(url)
-    if parsed.scheme not in {"http", "https"}:
+    # String checks instead of urlparse(): only the scheme and a non-empty authority matter.
+    scheme = url[:6].lower()
+    if scheme.startswith("https:"):
+        rest = 6
+    elif scheme.startswith("http:"):
+        rest = 5
+    else:
         return "URL must start with http:// or https://."
-    if not parsed.netloc:
+    if not url.startswith("//", rest) or not URL_NETLOC_PATTERN.match(url, rest + 2):
         return "URL must include a valid domain."
     return None
 
@@ -195,67 +528,79 @@ def validate_custom_code(code: str) -> str | None:
     if len(code) > 32:
         return "Short code must be at most 32 characters."
     
-    # Only allow alphanumeric, hyphens, and underscores
-    if not all(c.isalnum() or c in "-_" for c in code):
+    # Only allow ASCII letters, digits, hyphens, and underscores
+    if not CUSTOM_CODE_PATTERN.fullmatch(code):
         return "Short code can only contain letters, numbers, hyphens, and underscores."
     
     return None
 
 
-def base62_encode(value: int, min_length: int) -> str:
-    if value == 0:
-        encoded = "0"
-    else:
-        chars = []
-        while value > 0:
-            value, rem = divmod(value, 62)
-            chars.append(BASE62_ALPHABET[rem])
-        encoded = "".join(reversed(chars))
+def generate_code() -> str:
+    # Fixed-width base62: fill the buffer from the right, zero-padding implicitly.
+    value = secrets.randbelow(CODE_SPACE)
+    code = bytearray(CODE_LENGTH)
+    for index in range(CODE_LENGTH - 1, -1, -1):
+        value, rem = divmod(value, 62)
+        code[index] = BASE62_BYTES[rem]
+    return code.decode("ascii")
+
+
+def insert_unique_url(
+    db: sqlite3.Connection, original_url: str, created_at: int, expires_at: int
+) -> tuple[str, bool] | None:
+    for _ in range(10):
+        result = insert_custom_url(db, generate_code(), original_url, created_at, expires_at)
+        if result is not None:
+            return result
+    return None
 
-    if len(encoded) < min_length:
-        encoded = "0" * (min_length - len(encoded)) + encoded
-    return encoded
 
+def insert_custom_url(
+    db: sqlite3.Connection, code: str, original_url: str, created_at: int, expires_at: int
+) -> tuple[str, bool] | None:
+    """Insert URL with a custom short code.
+
+    Returns (code, created) where `created` is False and `code` is the existing one if the URL
+    was already shortened, or None if the code is taken by another URL.
+    """
+    if db.execute(SQL_INSERT_URL, (code, original_url, created_at, expires_at)).fetchone():
+        _url_cache.pop((app_database_path(), code))
+        return code, True
+    # Nothing inserted: either the URL was already shortened or the code belongs to another URL.
+    existing = db.execute(SQL_SELECT_CODE_BY_ORIGINAL, (original_url,)).fetchone()
+    if existing is None:
+        return None
+    return existing["code"], False
 
-def generate_code() -> str:
-    max_value = 62 ** CODE_LENGTH
-    return base62_encode(secrets.randbelow(max_value), CODE_LENGTH)
 
+def render_static(template: str) -> str:
+    """Render a template that takes no context once and reuse the HTML afterwards."""
+    if current_app.jinja_env.auto_reload:
+        return render_template(template)
+    rendered = current_app.extensions.setdefault("rendered_templates", {})
+    html = rendered.get(template)
+    if html is None:
+        html = rendered[template] = render_template(template)
+    return html
 
-def insert_unique_url(db: sqlite3.Connection, original_url: str, created_at: str, expires_at: str) -> str | None:
-    for _ in range(10):
-        code = generate_code()
-        exists = db.execute("SELECT 1 FROM urls WHERE code = ?", (code,)).fetchone()
-        if exists:
-            continue
-        try:
-            db.execute(
-                "INSERT INTO urls (code, original_url, created_at, expires_at) VALUES (?, ?, ?, ?)",
-                (code, original_url, created_at, expires_at),
-            )
-            db.commit()
-            return code
-        except sqlite3.IntegrityError:
-            continue
-    return None
 
+def dump_json(payload: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
 
-def insert_custom_url(db: sqlite3.Connection, code: str, original_url: str, created_at: str, expires_at: str) -> str | None:
-    """Insert URL with a custom short code. Returns the code if successful, None if code is taken."""
-    # Check if code already exists
-    exists = db.execute("SELECT 1 FROM urls WHERE code = ?", (code,)).fetchone()
-    if exists:
-        return None
-    
-    try:
-        db.execute(
-            "INSERT INTO urls (code, original_url, created_at, expires_at) VALUES (?, ?, ?, ?)",
-            (code, original_url, created_at, expires_at),
-        )
-        db.commit()
-        return code
-    except sqlite3.IntegrityError:
-        return None
+
+def json_response(payload: dict | bytes, status: int) -> Response:
+    """Build a JSON response; `payload` may be a body serialised ahead of time."""
+    body = payload if isinstance(payload, bytes) else dump_json(payload)
+    return Response(body, status=status, mimetype="application/json")
+
+
+# Fixed error bodies are serialised once at import.
+ERROR_RATE_LIMITED = dump_json({"error": "Rate limit exceeded. Try again later."})
+ERROR_REPEATED_SUBMISSION = dump_json({"error": "Too many repeated submissions. Try again later."})
+ERROR_CODE_TAKEN = dump_json({"error": "This short code is already taken. Please choose another one."})
+ERROR_NO_UNIQUE_CODE = dump_json({"error": "Unable to generate a unique short code."})
 
 
 def build_short_url(code: str) -> str:
@@ -264,24 +609,29 @@ def build_short_url(code: str) -> str:
 
 
 def get_client_ip() -> str:
-    forwarded = request.headers.get("X-Forwarded-For", "")
-    if forwarded:
-        return forwarded.split(",")[0].strip()
-    return request.remote_addr or "unknown"
+    # Memoised per request: both the rate limiter and the spam check ask for it.
+    ip = g.get("client_ip")
+    if ip is None:
+        # access_route is the non-empty X-Forwarded-For entries, or [remote_addr] without the header.
+        route = request.access_route
+        ip = g.client_ip = route[0] if route else (request.remote_addr or "unknown")
+    return ip
 
 
 def rate_limit(bucket: str):
+    if bucket not in RATE_LIMITS:
+        raise ValueError(f"Unknown rate limit bucket: {bucket!r}")
+
     def decorator(func):
+        # Limits are fixed at import, so resolve them once per decorated view.
+        config = RATE_LIMITS[bucket]
+        window_seconds = int(config["window"])
+        limit = int(config["limit"])
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            config = RATE_LIMITS.get(bucket)
-            if not config:
-                return func(*args, **kwargs)
-            db = get_db()
-            ip = get_client_ip()
-            allowed = check_rate_limit(db, ip, bucket, int(config["window"]), int(config["limit"]))
-            if not allowed:
-                return jsonify({"error": "Rate limit exceeded. Try again later."}), 429
+            if not check_rate_limit(get_client_ip(), bucket, window_seconds, limit):
+                return json_response(ERROR_RATE_LIMITED, 429)
             return func(*args, **kwargs)
 
         return wrapper
@@ -289,65 +639,41 @@ def rate_limit(bucket: str):
     return decorator
 
 
-def check_rate_limit(
-    db: sqlite3.Connection,
-    ip: str,
-    bucket: str,
-    window_seconds: int,
-    limit: int,
-) -> bool:
+def check_rate_limit(ip: str, bucket: str, window_seconds: int, limit: int) -> bool:
+    """Count a request against a fixed window held in process memory."""
     now = int(time.time())
-    row = db.execute(
-        "SELECT window_start, count FROM rate_limits WHERE ip = ? AND bucket = ?",
-        (ip, bucket),
-    ).fetchone()
-
-    if row is None or now - row["window_start"] >= window_seconds:
-        window_start = now
-        count = 1
-        db.execute(
-            """
-            INSERT INTO rate_limits (ip, bucket, window_start, count)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(ip, bucket) DO UPDATE SET window_start = ?, count = ?
-            """,
-            (ip, bucket, window_start, count, window_start, count),
-        )
-    else:
-        count = row["count"] + 1
-        db.execute(
-            "UPDATE rate_limits SET count = ? WHERE ip = ? AND bucket = ?",
-            (count, ip, bucket),
-        )
-    db.commit()
+    key = (ip, bucket)
+    with _rate_lock:
+        window_start, count = _rate_state.get(key, (now, 0))
+        if now - window_start >= window_seconds:
+            window_start, count = now, 0
+            # A fresh window moves to the end, keeping the oldest windows at the front.
+            _rate_state.pop(key, None)
+        count += 1
+        _rate_state[key] = (window_start, count)
+        if len(_rate_state) > RATE_STATE_MAX_ENTRIES:
+            evict_rate_state()
     return count <= limit
 
 
+def evict_rate_state() -> None:
+    """Drop the oldest windows until the cap holds. Caller holds `_rate_lock`."""
+    while len(_rate_state) > RATE_STATE_MAX_ENTRIES:
+        _rate_state.popitem(last=False)
+
+
 def is_spam_submission(db: sqlite3.Connection, ip: str, original_url: str) -> bool:
+    """Count a submission of `original_url` by `ip`. Runs inside the caller's transaction."""
     now = int(time.time())
-    row = db.execute(
-        "SELECT window_start, count FROM spam_submissions WHERE ip = ? AND original_url = ?",
-        (ip, original_url),
-    ).fetchone()
+    row = db.execute(SQL_SELECT_SPAM, (ip, original_url)).fetchone()
 
     if row is None or now - row["window_start"] >= SPAM_WINDOW_SECONDS:
         window_start = now
         count = 1
-        db.execute(
-            """
-            INSERT INTO spam_submissions (ip, original_url, window_start, count)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(ip, original_url) DO UPDATE SET window_start = ?, count = ?
-            """,
-            (ip, original_url, window_start, count, window_start, count),
-        )
+        db.execute(SQL_RESET_SPAM, (ip, original_url, window_start, count))
     else:
         count = row["count"] + 1
-        db.execute(
-            "UPDATE spam_submissions SET count = ? WHERE ip = ? AND original_url = ?",
-            (count, ip, original_url),
-        )
-    db.commit()
+        db.execute(SQL_UPDATE_SPAM, (count, ip, original_url))
     return count > SPAM_MAX_DUPLICATES
 
 
@@ -2,22 +2,18 @@ CREATE TABLE IF NOT EXISTS urls (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     code TEXT NOT NULL UNIQUE,
     original_url TEXT NOT NULL UNIQUE,
-    created_at TEXT NOT NULL,
-    expires_at TEXT NOT NULL,
+    created_at INTEGER NOT NULL, -- unix seconds
+    expires_at INTEGER NOT NULL, -- unix seconds
     click_count INTEGER NOT NULL DEFAULT 0
 );
 
-CREATE INDEX IF NOT EXISTS idx_urls_code ON urls (code);
-CREATE INDEX IF NOT EXISTS idx_urls_original_url ON urls (original_url);
+-- code and original_url are already indexed by their UNIQUE constraints.
+DROP INDEX IF EXISTS idx_urls_code;
+DROP INDEX IF EXISTS idx_urls_original_url;
 CREATE INDEX IF NOT EXISTS idx_urls_expires_at ON urls (expires_at);
 
-CREATE TABLE IF NOT EXISTS rate_limits (
-    ip TEXT NOT NULL,
-    bucket TEXT NOT NULL,
-    window_start INTEGER NOT NULL,
-    count INTEGER NOT NULL,
-    PRIMARY KEY (ip, bucket)
-);
+-- Rate limits are kept in process memory now.
+DROP TABLE IF EXISTS rate_limits;
 
 CREATE TABLE IF NOT EXISTS spam_submissions (
     ip TEXT NOT NULL,
@@ -26,3 +22,5 @@ CREATE TABLE IF NOT EXISTS spam_submissions (
     count INTEGER NOT NULL,
     PRIMARY KEY (ip, original_url)
 );
+
+CREATE INDEX IF NOT EXISTS idx_spam_submissions_window_start ON spam_submissions (window_start);